@@ -1,8 +1,14 @@
-from flask import Flask, render_template_string
+from flask import Flask, render_template_string, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
-from app.models.user import db, bcrypt
+from app.models.user import db, bcrypt, migrate
+from app.models.sharding import create_shard_tables
+from app.models.id_sequence import IdSequence
+from app.services.rate_limit import limiter
+from app.services.token_blocklist import blocklist
+from app.services.events import events
 
 
 def create_app(config_name='development'):
@@ -10,20 +16,43 @@ def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
     
+    # Trust X-Forwarded-For from the configured number of proxies, so
+    # request.remote_addr (and the rate limit keys) is the real client
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
     # Initialize extensions
     CORS(app)
     db.init_app(app)
+    migrate.init_app(app, db, render_as_batch=True)
     bcrypt.init_app(app)
+    limiter.init_app(app)
+    events.init_app(app)
     jwt = JWTManager(app)
     
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return blocklist.is_revoked(jwt_payload['jti'])
+    
+    @jwt.token_verification_loader
+    def check_token_scope(jwt_header, jwt_payload):
+        # Stream tokens travel in URLs, so they may only open the SSE stream
+        return jwt_payload.get('scope') != 'stream' or request.endpoint == 'api.stream_summary'
+    
     # Create database tables
     with app.app_context():
         db.create_all()
+        create_shard_tables(db)
+        IdSequence.seed()
     
     # Register blueprints
     from app.routes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
     
+    # Register CLI commands
+    from app.cli import register_cli
+    register_cli(app)
+    
     return app
 
 
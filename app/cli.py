@@ -0,0 +1,155 @@
+import click
+from datetime import date, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+from app.models.user import db
+from app.models.finance import ArchivedTransaction, FinancialGoal
+from app.models.sharding import shard_for, shard_keys, use_shard
+from app.services.shards import count_rows, misplaced_users, move_user
+from app.services.token_blocklist import prune_revoked_tokens
+from app.services.jobs import run_worker
+
+
+goals_cli = AppGroup('goals', help='Financial goal maintenance commands.')
+
+
+@goals_cli.command('reconcile')
+@click.option('--user-id', type=int, help='Only reconcile goals of this user.')
+def reconcile_goals(user_id):
+    """Recompute goal amounts and progress from linked transactions."""
+    keys = shard_keys() if user_id is None else [shard_for(user_id)]
+    
+    changed = 0
+    for key in keys:
+        with use_shard(key):
+            query = FinancialGoal.query
+            if user_id is not None:
+                query = query.filter_by(user_id=user_id)
+            
+            for goal in query.all():
+                before = (goal.current_amount, goal.progress)
+                goal.reconcile()
+                if (goal.current_amount, goal.progress) != before:
+                    changed += 1
+            db.session.commit()
+        # Ids repeat across shards, so never carry objects over
+        db.session.expunge_all()
+    
+    click.echo(f'Reconciled goals, {changed} updated.')
+
+
+transactions_cli = AppGroup('transactions', help='Transaction maintenance commands.')
+
+
+@transactions_cli.command('archive')
+@click.option('--days', type=int, help='Archive transactions older than this many days.')
+@click.option('--batch-size', type=int, help='Rows moved per commit.')
+def archive_transactions(days, batch_size):
+    """Move old transactions from the hot table into the archive."""
+    days = days if days is not None else current_app.config['ARCHIVE_AFTER_DAYS']
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    cutoff = date.today() - timedelta(days=days)
+    
+    moved = 0
+    for key in shard_keys():
+        with use_shard(key):
+            moved += ArchivedTransaction.archive_before(cutoff, batch_size)
+    click.echo(f'Archived {moved} transactions dated before {cutoff.isoformat()}.')
+
+
+tokens_cli = AppGroup('tokens', help='JWT blocklist maintenance commands.')
+
+
+@tokens_cli.command('prune')
+def prune_tokens():
+    """Delete revoked tokens that have already expired."""
+    deleted = prune_revoked_tokens()
+    click.echo(f'Pruned {deleted} expired revoked tokens.')
+
+
+jobs_cli = AppGroup('jobs', help='Background job commands.')
+
+
+@jobs_cli.command('worker')
+@click.option('--threads', type=int, help='Number of worker threads.')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+def jobs_worker(threads, burst):
+    """Run queued background jobs."""
+    app = current_app._get_current_object()
+    threads = threads or app.config['JOB_WORKER_THREADS']
+    
+    click.echo(f'Starting job worker with {threads} threads.')
+    run_worker(
+        app,
+        threads=threads,
+        poll_interval=app.config['JOB_POLL_INTERVAL'],
+        burst=burst,
+        lease_timeout=app.config['JOB_LEASE_TIMEOUT'],
+        max_attempts=app.config['JOB_MAX_ATTEMPTS']
+    )
+
+
+shards_cli = AppGroup('shards', help='Finance data sharding commands.')
+
+
+@shards_cli.command('status')
+def shards_status():
+    """Show the row counts of the main database and every shard."""
+    keys = current_app.config.get('SHARD_KEYS')
+    if not keys:
+        click.echo('Sharding is not configured (SHARD_URLS is empty).')
+        return
+    
+    for key in [None, *keys]:
+        counts = ', '.join(f'{table}={count}' for table, count in count_rows(key).items())
+        click.echo(f'{key or "main"}: {counts}')
+
+
+@shards_cli.command('rebalance')
+@click.option('--dry-run', is_flag=True, help='Only list the users that would move.')
+def rebalance_shards(dry_run):
+    """Move users whose data is not on the shard the shard map assigns them.
+    
+    Data still in the main database from before sharding is moved too.
+    Rows keep their ids; users whose ids clash with rows already in the
+    target are skipped and reported. Each source is write-locked while a
+    user is moved, so their requests on servers with the old shard map may
+    wait or fail during the move.
+    """
+    keys = current_app.config.get('SHARD_KEYS')
+    if not keys:
+        click.echo('Sharding is not configured (SHARD_URLS is empty).')
+        return
+    
+    unknown = set(current_app.config.get('SHARD_MAP', {}).values()) - set(keys)
+    if unknown:
+        raise click.ClickException(f'SHARD_MAP refers to unknown shards: {", ".join(sorted(unknown))}')
+    
+    moved = skipped = 0
+    for source in [None, *keys]:
+        for user_id in misplaced_users(source):
+            target = shard_for(user_id)
+            if dry_run:
+                click.echo(f'User {user_id}: {source or "main"} -> {target}')
+            else:
+                try:
+                    counts = move_user(user_id, source, target)
+                except ValueError as e:
+                    click.echo(f'User {user_id}: skipped, {e}', err=True)
+                    skipped += 1
+                    continue
+                click.echo(f'User {user_id}: {source or "main"} -> {target} ({sum(counts.values())} rows)')
+            moved += 1
+    
+    click.echo(f'{moved} users {"to move" if dry_run else "moved"}.')
+    if skipped:
+        raise click.ClickException(f'{skipped} users could not be moved.')
+
+
+def register_cli(app):
+    """Register the custom ``flask`` CLI command groups."""
+    app.cli.add_command(goals_cli)
+    app.cli.add_command(transactions_cli)
+    app.cli.add_command(tokens_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(shards_cli)
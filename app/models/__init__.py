@@ -1,2 +1,6 @@
 from .user import User
-from .finance import Category, Transaction, TransactionType, FinancialGoal 
\ No newline at end of file
+from .finance import Category, Transaction, ArchivedTransaction, TransactionType, FinancialGoal
+from .token import RevokedToken
+from .job import Job, JobStatus
+from .idempotency import IdempotencyKey
+from .id_sequence import IdSequence
@@ -1,6 +1,8 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from app.models.user import db
-from sqlalchemy import Enum
+from app.models.sharding import SHARDED
+from sqlalchemy import Enum, case, func, or_
 import enum
 
 
@@ -9,9 +11,15 @@ class TransactionType(enum.Enum):
     EXPENSE = "expense"
 
 
+def signed_amount(model):
+    """SQL expression for a transaction's effect on goals: income adds, expense subtracts."""
+    return case((model.type == TransactionType.EXPENSE, -model.amount), else_=model.amount)
+
+
 class Category(db.Model):
     """Model for transaction categories."""
     __tablename__ = 'categories'
+    __table_args__ = SHARDED
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -47,12 +55,23 @@ class Transaction(db.Model):
     amount = db.Column(db.Numeric(10, 2), nullable=False)
     type = db.Column(Enum(TransactionType), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    goal_id = db.Column(db.Integer, db.ForeignKey('financial_goals.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     date = db.Column(db.Date, nullable=False, default=datetime.utcnow().date)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_transactions_user_date', 'user_id', 'date'),
+        # AUTOINCREMENT keeps ids of archived rows from being reused
+        dict(SHARDED, sqlite_autoincrement=True)
+    )
+    
+    def contribution(self):
+        """This transaction's effect on linked goals: income adds, expense subtracts."""
+        return -self.amount if self.type == TransactionType.EXPENSE else self.amount
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -63,6 +82,7 @@ class Transaction(db.Model):
             'category_name': self.category.name if self.category else None,
             'category_color': self.category.color if self.category else None,
             'category_icon': self.category.icon if self.category else None,
+            'goal_id': self.goal_id,
             'user_id': self.user_id,
             'date': self.date.isoformat(),
             'notes': self.notes,
@@ -71,14 +91,219 @@ class Transaction(db.Model):
         }
 
 
+class ArchivedTransaction(db.Model):
+    """Model for transactions moved out of the hot ``transactions`` table."""
+    __tablename__ = 'transactions_archive'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    amount = db.Column(db.Numeric(10, 2), nullable=False)
+    type = db.Column(Enum(TransactionType), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=False)
+    goal_id = db.Column(db.Integer, db.ForeignKey('financial_goals.id'))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, server_default=func.now())
+    
+    __table_args__ = (
+        db.Index('ix_transactions_archive_user_date', 'user_id', 'date'),
+        # Archived rows keep their transaction id, so they share its sequence
+        {'info': dict(SHARDED['info'], id_sequence='transactions')}
+    )
+    
+    # Relationships
+    category = db.relationship('Category')
+    
+    contribution = Transaction.contribution
+    to_dict = Transaction.to_dict
+    
+    @staticmethod
+    def archive_before(cutoff, batch_size=1000):
+        """Move transactions dated before ``cutoff`` into the archive.
+        
+        Works in batches of ``batch_size`` rows, each copied and deleted in
+        its own commit. Returns the number of rows moved.
+        """
+        columns = [column.name for column in Transaction.__table__.columns]
+        moved = 0
+        while True:
+            ids = db.session.scalars(
+                db.select(Transaction.id)
+                .where(Transaction.date < cutoff)
+                .order_by(Transaction.date, Transaction.id)
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                return moved
+            
+            db.session.execute(
+                db.insert(ArchivedTransaction).from_select(
+                    columns,
+                    db.select(*Transaction.__table__.columns).where(Transaction.id.in_(ids))
+                )
+            )
+            db.session.execute(
+                db.delete(Transaction)
+                .where(Transaction.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            moved += len(ids)
+    
+    @staticmethod
+    def latest_date(user_id):
+        """Newest archived transaction date of a user, or None if there is none.
+        
+        Scoped to the user so the ``(user_id, date)`` index answers it
+        without scanning the archive.
+        """
+        return db.session.scalar(
+            db.select(func.max(ArchivedTransaction.date))
+            .where(ArchivedTransaction.user_id == user_id)
+        )
+
+
+# Transaction fields served from the joined categories table
+CATEGORY_FIELDS = {
+    'category_name': Category.name,
+    'category_color': Category.color,
+    'category_icon': Category.icon
+}
+TRANSACTION_FIELDS = [column.name for column in Transaction.__table__.columns] + list(CATEGORY_FIELDS)
+
+
+def json_value(value):
+    """Convert a raw column value to the form ``to_dict`` returns it in."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def serialize_rows(rows, fields):
+    """Build ``to_dict``-style dicts holding only ``fields`` from result rows."""
+    return [{field: json_value(row[field]) for field in fields} for row in rows]
+
+
+def _transaction_models(user_id, start):
+    """Models to read for a range starting at ``start``; the archive only if needed."""
+    models = [Transaction]
+    latest_archived = ArchivedTransaction.latest_date(user_id)
+    if latest_archived is not None and (start is None or start <= latest_archived):
+        models.append(ArchivedTransaction)
+    return models
+
+
+def _range_criteria(model, user_id, start, end):
+    criteria = [model.user_id == user_id]
+    if start is not None:
+        criteria.append(model.date >= start)
+    if end is not None:
+        criteria.append(model.date <= end)
+    return criteria
+
+
+def query_transactions(user_id, start=None, end=None):
+    """Return a user's transactions in a date range, newest first.
+    
+    The archive is only queried when the range reaches back to dates it
+    holds, so recent reads touch the hot table alone.
+    """
+    models = _transaction_models(user_id, start)
+    
+    transactions = []
+    for model in models:
+        transactions.extend(
+            model.query
+            .options(db.joinedload(model.category))
+            .filter(*_range_criteria(model, user_id, start, end))
+            .order_by(model.date.desc())
+            .all()
+        )
+    
+    if len(models) > 1:
+        transactions.sort(key=lambda transaction: transaction.date, reverse=True)
+    return transactions
+
+
+def query_transaction_fields(user_id, fields, start=None, end=None):
+    """Like ``query_transactions`` but selecting only ``fields``, as dicts.
+    
+    Only the requested columns are read, and categories are joined only
+    when a ``category_*`` field is asked for.
+    """
+    models = _transaction_models(user_id, start)
+    
+    rows = []
+    for model in models:
+        columns = [
+            CATEGORY_FIELDS[field].label(field) if field in CATEGORY_FIELDS else model.__table__.c[field]
+            for field in fields
+        ]
+        stmt = (
+            db.select(*columns, model.date.label('_date'))
+            .select_from(model)
+            .where(*_range_criteria(model, user_id, start, end))
+            .order_by(model.date.desc())
+        )
+        if any(field in CATEGORY_FIELDS for field in fields):
+            stmt = stmt.outerjoin(Category, Category.id == model.category_id)
+        rows.extend(db.session.execute(stmt).mappings().all())
+    
+    if len(models) > 1:
+        rows.sort(key=lambda row: row['_date'], reverse=True)
+    return serialize_rows(rows, fields)
+
+
+def monthly_summary(user_id, today=None):
+    """Income, expense, balance and count of a user's transactions this month."""
+    today = today or date.today()
+    start = date(today.year, today.month, 1)
+    if today.month == 12:
+        end = date(today.year + 1, 1, 1) - timedelta(days=1)
+    else:
+        end = date(today.year, today.month + 1, 1) - timedelta(days=1)
+    
+    totals = {TransactionType.INCOME: 0, TransactionType.EXPENSE: 0}
+    count = 0
+    for model in _transaction_models(user_id, start):
+        rows = db.session.execute(
+            db.select(model.type, func.sum(model.amount), func.count())
+            .where(*_range_criteria(model, user_id, start, end))
+            .group_by(model.type)
+        ).all()
+        for transaction_type, amount, type_count in rows:
+            totals[transaction_type] += amount
+            count += type_count
+    
+    total_income = totals[TransactionType.INCOME]
+    total_expense = totals[TransactionType.EXPENSE]
+    return {
+        'total_income': float(total_income),
+        'total_expense': float(total_expense),
+        'balance': float(total_income - total_expense),
+        'transactions_count': count
+    }
+
+
 class FinancialGoal(db.Model):
     """Model for financial goals."""
     __tablename__ = 'financial_goals'
+    __table_args__ = SHARDED
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
     target_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    initial_amount = db.Column(db.Numeric(10, 2), default=0)
     current_amount = db.Column(db.Numeric(10, 2), default=0)
+    progress = db.Column(db.Numeric(5, 2), default=0)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     deadline = db.Column(db.Date)
     description = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -86,14 +311,123 @@ class FinancialGoal(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    # Relationships
+    transactions = db.relationship('Transaction', backref='goal', lazy=True)
+    
+    @staticmethod
+    def progress_expression(amount):
+        """SQL expression for the capped progress percentage of ``amount``."""
+        target = FinancialGoal.target_amount
+        return case(
+            (target <= 0, 0),
+            (amount >= target, 100),
+            else_=amount * 100 / target
+        )
+    
+    @staticmethod
+    def contributions_filter(transaction):
+        """Filter matching the goals a transaction contributes to."""
+        return db.and_(
+            FinancialGoal.user_id == transaction.user_id,
+            or_(
+                FinancialGoal.id == transaction.goal_id,
+                FinancialGoal.category_id == transaction.category_id
+            )
+        )
+    
+    @staticmethod
+    def apply_contribution(transaction, sign=1):
+        """Add (or with ``sign=-1`` remove) a transaction's contribution to its goals.
+        
+        Runs as a single ``UPDATE`` in the caller's transaction so progress is
+        kept current without re-summing the transaction history.
+        """
+        new_amount = FinancialGoal.current_amount + sign * transaction.contribution()
+        db.session.execute(
+            db.update(FinancialGoal)
+            .where(FinancialGoal.contributions_filter(transaction))
+            .values(
+                current_amount=new_amount,
+                progress=FinancialGoal.progress_expression(new_amount),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    @staticmethod
+    def apply_bulk_contribution(user_id, criteria, sign=1, model=Transaction):
+        """Add (or remove) the contributions of every matching transaction to their goals.
+        
+        ``criteria`` are filter clauses on ``model``, the hot table or the
+        archive. Each goal is adjusted by a correlated ``SUM`` in one
+        ``UPDATE``, however many rows match.
+        """
+        links = db.and_(
+            model.user_id == user_id,
+            *criteria,
+            or_(
+                model.goal_id == FinancialGoal.id,
+                model.category_id == FinancialGoal.category_id
+            )
+        )
+        linked_sum = (
+            db.select(func.coalesce(func.sum(signed_amount(model)), 0))
+            .where(links)
+            .correlate(FinancialGoal)
+            .scalar_subquery()
+        )
+        new_amount = FinancialGoal.current_amount + sign * linked_sum
+        db.session.execute(
+            db.update(FinancialGoal)
+            .where(
+                FinancialGoal.user_id == user_id,
+                db.select(model.id).where(links).correlate(FinancialGoal).exists()
+            )
+            .values(
+                current_amount=new_amount,
+                progress=FinancialGoal.progress_expression(new_amount),
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    def linked_total(self):
+        """Net contribution of every hot and archived transaction linked to this goal."""
+        total = 0
+        for model in (Transaction, ArchivedTransaction):
+            links = []
+            if self.id is not None:
+                links.append(model.goal_id == self.id)
+            if self.category_id is not None:
+                links.append(model.category_id == self.category_id)
+            if not links:
+                return 0
+            
+            total += db.session.query(func.sum(signed_amount(model))).filter(
+                model.user_id == self.user_id,
+                or_(*links)
+            ).scalar() or 0
+        return total
+    
+    def reconcile(self):
+        """Recompute ``current_amount`` and ``progress`` from scratch."""
+        # Go through str so float inputs combine exactly with Decimal sums
+        target = Decimal(str(self.target_amount))
+        self.current_amount = Decimal(str(self.initial_amount or 0)) + Decimal(str(self.linked_total()))
+        if target <= 0:
+            self.progress = 0
+        else:
+            self.progress = min(self.current_amount * 100 / target, Decimal(100))
+    
     def to_dict(self):
-        progress = (float(self.current_amount) / float(self.target_amount)) * 100 if self.target_amount > 0 else 0
         return {
             'id': self.id,
             'name': self.name,
             'target_amount': float(self.target_amount),
+            'initial_amount': float(self.initial_amount or 0),
             'current_amount': float(self.current_amount),
-            'progress': min(progress, 100),
+            'progress': float(self.progress or 0),
+            'category_id': self.category_id,
             'deadline': self.deadline.isoformat() if self.deadline else None,
             'description': self.description,
             'user_id': self.user_id,
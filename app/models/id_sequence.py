@@ -0,0 +1,89 @@
+from flask import current_app
+from sqlalchemy import event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from app.models.user import db
+from app.models.sharding import ShardedSession
+
+
+def sequence_name(table):
+    """Name of the id sequence ``table`` draws from."""
+    return table.info.get('id_sequence', table.name)
+
+
+class IdSequence(db.Model):
+    """Model for the last id handed out to a sharded table.
+    
+    With sharding on, new rows of sharded tables take their ids from this
+    table in the main database rather than from their shard, so an id is
+    unique across every shard and stays the same when a user is moved.
+    """
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    
+    @staticmethod
+    def allocate(name, count=1):
+        """Reserve ``count`` consecutive ids of sequence ``name``; return the first.
+        
+        Runs on its own connection and commits at once, so concurrent
+        requests only hold the main database lock for this one ``UPDATE``.
+        """
+        table = IdSequence.__table__
+        with db.engines[None].begin() as conn:
+            last_id = conn.execute(
+                db.update(table)
+                .where(table.c.name == name)
+                .values(last_id=table.c.last_id + count)
+                .returning(table.c.last_id)
+            ).scalar()
+        if last_id is None:
+            raise RuntimeError(f'No id sequence {name!r}; it is created on app start when sharding is on.')
+        return last_id - count + 1
+    
+    @staticmethod
+    def seed():
+        """Move every sequence past the largest id already in the main database or a shard."""
+        keys = current_app.config.get('SHARD_KEYS')
+        if not keys:
+            return
+        
+        tables = [table for table in db.metadata.sorted_tables if table.info.get('sharded')]
+        largest = {}
+        for key in [None, *keys]:
+            with db.engines[key].connect() as conn:
+                for table in tables:
+                    name = sequence_name(table)
+                    top = conn.execute(db.select(func.max(table.c.id))).scalar() or 0
+                    largest[name] = max(largest.get(name, 0), top)
+        
+        sequences = IdSequence.__table__
+        for name, top in largest.items():
+            # Workers start concurrently, so tolerate another one inserting first
+            try:
+                with db.engines[None].begin() as conn:
+                    conn.execute(db.insert(sequences).values(name=name, last_id=top))
+            except IntegrityError:
+                with db.engines[None].begin() as conn:
+                    conn.execute(
+                        db.update(sequences)
+                        .where(sequences.c.name == name, sequences.c.last_id < top)
+                        .values(last_id=top)
+                    )
+
+
+@event.listens_for(ShardedSession, 'before_flush')
+def assign_sharded_ids(session, flush_context, instances):
+    """Give new rows of sharded tables ids from their global sequence."""
+    if not current_app.config.get('SHARD_KEYS'):
+        return
+    
+    pending = {}
+    for obj in session.new:
+        table = inspect(obj).mapper.local_table
+        if table.info.get('sharded') and obj.id is None:
+            pending.setdefault(sequence_name(table), []).append(obj)
+    for name, objs in pending.items():
+        first = IdSequence.allocate(name, len(objs))
+        for offset, obj in enumerate(objs):
+            obj.id = first + offset
@@ -0,0 +1,28 @@
+from datetime import datetime
+from app.models.user import db
+
+
+class IdempotencyKey(db.Model):
+    """Model for the stored first response to an ``Idempotency-Key``.
+    
+    A row with no ``status_code`` marks a request that is still running.
+    """
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64))  # SHA-256 of the URL arguments and body
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
+    
+    @property
+    def is_complete(self):
+        return self.status_code is not None
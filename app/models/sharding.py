@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, has_request_context
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import inspect
+from sqlalchemy.sql.util import find_tables
+
+
+# Explicit shard chosen with ``use_shard``; unset means "derive from the JWT"
+_UNSET = object()
+_shard_key = ContextVar('shard_key', default=_UNSET)
+
+# Marker for ``__table_args__`` of tables whose rows are split across shards
+SHARDED = {'info': {'sharded': True}}
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash: map an integer key to one of ``buckets``.
+    
+    Adding a bucket only moves about ``1 / buckets`` of the keys, so growing
+    the shard list keeps rebalancing small.
+    """
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_keys():
+    """Bind keys of the configured shards; ``[None]`` when sharding is off."""
+    return current_app.config.get('SHARD_KEYS') or [None]
+
+
+def shard_for(user_id):
+    """Bind key holding the finance data of ``user_id``."""
+    keys = current_app.config.get('SHARD_KEYS')
+    if not keys:
+        return None
+    
+    override = current_app.config.get('SHARD_MAP', {}).get(str(user_id))
+    if override is not None:
+        return override
+    return keys[jump_hash(int(user_id), len(keys))]
+
+
+@contextmanager
+def use_shard(key):
+    """Route sharded tables to bind ``key`` inside the block."""
+    token = _shard_key.set(key)
+    try:
+        yield
+    finally:
+        _shard_key.reset(token)
+
+
+def use_user_shard(user_id):
+    """Route sharded tables to the shard of ``user_id`` inside the block."""
+    return use_shard(shard_for(user_id))
+
+
+def current_shard():
+    """Bind key for sharded tables in the current context.
+    
+    An explicit ``use_shard`` wins; otherwise the shard is derived from
+    ``get_jwt_identity()`` of the current request.
+    """
+    key = _shard_key.get()
+    if key is not _UNSET:
+        return key
+    if not current_app.config.get('SHARD_KEYS'):
+        return None
+    
+    user_id = None
+    if has_request_context():
+        try:
+            user_id = get_jwt_identity()
+        except RuntimeError:
+            pass
+    if user_id is None:
+        raise RuntimeError('No shard selected: use use_shard() or a JWT-protected request.')
+    return shard_for(user_id)
+
+
+def _is_sharded(mapper, clause):
+    if mapper is not None and inspect(mapper).local_table.info.get('sharded'):
+        return True
+    if clause is not None:
+        return any(table.info.get('sharded') for table in find_tables(clause, include_crud=True))
+    return False
+
+
+class ShardedSession(Session):
+    """Session sending statements on sharded tables to the current user's shard."""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _is_sharded(mapper, clause):
+            key = current_shard()
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def create_shard_tables(db):
+    """Create the sharded tables in every shard database."""
+    tables = [table for table in db.metadata.sorted_tables if table.info.get('sharded')]
+    for key in current_app.config.get('SHARD_KEYS') or []:
+        db.metadata.create_all(bind=db.engines[key], tables=tables)
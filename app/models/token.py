@@ -0,0 +1,27 @@
+from datetime import datetime
+from app.models.user import db
+
+
+class RevokedToken(db.Model):
+    """Model for revoked JWTs, kept until the token would have expired."""
+    __tablename__ = 'revoked_tokens'
+    # Workers sync on ``id > last seen id``, so ids freed by pruning must
+    # never be handed out again.
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'jti': self.jti,
+            'token_type': self.token_type,
+            'user_id': self.user_id,
+            'expires_at': self.expires_at.isoformat(),
+            'revoked_at': self.revoked_at.isoformat()
+        }
@@ -1,9 +1,12 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from flask_migrate import Migrate
+from app.models.sharding import ShardedSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': ShardedSession})
 bcrypt = Bcrypt()
+migrate = Migrate()
 
 
 class User(db.Model):
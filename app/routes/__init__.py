@@ -2,4 +2,4 @@ from flask import Blueprint
 
 api_bp = Blueprint('api', __name__)
 
-from . import health, auth, finance 
\ No newline at end of file
+from . import health, auth, finance, jobs
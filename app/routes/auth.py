@@ -1,12 +1,15 @@
 from flask import request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt, decode_token
 from app.routes import api_bp
 from app.models.user import User, db
 from app.schemas.user import UserRegisterSchema, UserLoginSchema, UserSchema
+from app.services.rate_limit import limiter
+from app.services.token_blocklist import blocklist
 from marshmallow import ValidationError
 
 
 @api_bp.route('/auth/register', methods=['POST'])
+@limiter.limit('auth')
 def register():
     """Register a new user."""
     try:
@@ -46,6 +49,7 @@ def register():
 
 
 @api_bp.route('/auth/login', methods=['POST'])
+@limiter.limit('auth')
 def login():
     """Login user and return JWT tokens."""
     try:
@@ -91,6 +95,41 @@ def refresh():
     }), 200
 
 
+@api_bp.route('/auth/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    """Revoke the current access token and, if given, its refresh token."""
+    current_user_id = get_jwt_identity()
+    
+    data = request.get_json(silent=True) or {}
+    refresh_token = None
+    if data.get('refresh_token'):
+        try:
+            refresh_token = decode_token(data['refresh_token'])
+        except Exception as e:
+            return jsonify({'error': 'Invalid refresh token'}), 400
+        
+        if refresh_token['type'] != 'refresh' or refresh_token['sub'] != current_user_id:
+            return jsonify({'error': 'Invalid refresh token'}), 400
+    
+    blocklist.revoke(get_jwt())
+    if refresh_token:
+        blocklist.revoke(refresh_token)
+    db.session.commit()
+    
+    return jsonify({'message': 'Logout successful'}), 200
+
+
+@api_bp.route('/auth/revoke', methods=['POST'])
+@jwt_required(refresh=True)
+def revoke():
+    """Revoke the current refresh token."""
+    blocklist.revoke(get_jwt())
+    db.session.commit()
+    
+    return jsonify({'message': 'Token revoked successfully'}), 200
+
+
 @api_bp.route('/auth/profile', methods=['GET'])
 @jwt_required()
 def get_profile():
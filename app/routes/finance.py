@@ -1,16 +1,55 @@
-from flask import request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+import json
+import queue
+import time
+from flask import Response, current_app, request, jsonify, stream_with_context
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt, get_jwt_identity, get_jwt_request_location
 from app.routes import api_bp
-from app.models.finance import Category, Transaction, FinancialGoal, TransactionType
-from app.schemas.finance import CategorySchema, TransactionSchema, FinancialGoalSchema
+from app.models.finance import (
+    Category, Transaction, ArchivedTransaction, FinancialGoal, TransactionType, TRANSACTION_FIELDS,
+    monthly_summary, query_transactions, query_transaction_fields, serialize_rows
+)
+from app.schemas.finance import CategorySchema, TransactionSchema, TransactionBulkSchema, FinancialGoalSchema
 from app.models.user import db
-from datetime import datetime, date, timedelta
+from app.services.idempotency import idempotent
+from app.services.events import events
+from app.services.token_blocklist import blocklist
+from marshmallow import ValidationError
+from datetime import datetime
+from decimal import Decimal
 
 
 # Schemas
 category_schema = CategorySchema()
 transaction_schema = TransactionSchema()
 goal_schema = FinancialGoalSchema()
+bulk_schema = TransactionBulkSchema()
+
+# Fields a bulk update may change, and those that move goal contributions
+BULK_UPDATE_FIELDS = ('description', 'amount', 'type', 'category_id', 'goal_id', 'date', 'notes')
+CONTRIBUTION_FIELDS = {'amount', 'type', 'category_id', 'goal_id'}
+bulk_changes_schema = TransactionSchema(partial=True, only=BULK_UPDATE_FIELDS)
+
+
+def _requested_fields(allowed):
+    """Parse the ``?fields=`` sparse fieldset, or None to return every field."""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    
+    fields = list(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ValidationError({'fields': [f'Unknown fields: {", ".join(unknown)}'], 'available': list(allowed)})
+    return fields
+
+
+def _select_fields(model, fields, current_user_id):
+    """Read only ``fields`` of the current user's rows of ``model``."""
+    rows = db.session.execute(
+        db.select(*(model.__table__.c[field] for field in fields))
+        .where(model.user_id == current_user_id)
+    ).mappings().all()
+    return serialize_rows(rows, fields)
 
 
 # ==================== CATEGORIES ====================
@@ -20,15 +59,26 @@ goal_schema = FinancialGoalSchema()
 def get_categories():
     """Get all categories for the current user."""
     current_user_id = get_jwt_identity()
-    categories = Category.query.filter_by(user_id=current_user_id).all()
+    
+    try:
+        fields = _requested_fields(Category.__table__.columns.keys())
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    
+    if fields:
+        categories = _select_fields(Category, fields, current_user_id)
+    else:
+        categories = [category.to_dict() for category in Category.query.filter_by(user_id=current_user_id).all()]
+    
     return jsonify({
         'message': 'Categories retrieved successfully',
-        'categories': [category.to_dict() for category in categories]
+        'categories': categories
     }), 200
 
 
 @api_bp.route('/finance/categories', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_category():
     """Create a new category."""
     current_user_id = get_jwt_identity()
@@ -58,16 +108,26 @@ def create_category():
 def get_transactions():
     """Get all transactions for the current user."""
     current_user_id = get_jwt_identity()
-    transactions = Transaction.query.filter_by(user_id=current_user_id).order_by(Transaction.date.desc()).all()
+    
+    try:
+        fields = _requested_fields(TRANSACTION_FIELDS)
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    
+    if fields:
+        transactions = query_transaction_fields(current_user_id, fields)
+    else:
+        transactions = [transaction.to_dict() for transaction in query_transactions(current_user_id)]
     
     return jsonify({
         'message': 'Transactions retrieved successfully',
-        'transactions': [transaction.to_dict() for transaction in transactions]
+        'transactions': transactions
     }), 200
 
 
 @api_bp.route('/finance/transactions', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_transaction():
     """Create a new transaction."""
     current_user_id = get_jwt_identity()
@@ -81,36 +141,176 @@ def create_transaction():
         if not category:
             return jsonify({'error': 'Category not found'}), 404
         
+        # Validate goal belongs to user
+        if data.get('goal_id') is not None:
+            goal = FinancialGoal.query.filter_by(id=data['goal_id'], user_id=current_user_id).first()
+            if not goal:
+                return jsonify({'error': 'Goal not found'}), 404
+        
+        # Accept 'income'/'expense' as well as the enum names; goal
+        # contributions depend on the type being a TransactionType.
+        data['type'] = TransactionType(str(data['type']).lower())
+        
         transaction = Transaction(**data)
         db.session.add(transaction)
+        FinancialGoal.apply_contribution(transaction)
         db.session.commit()
         
-        return jsonify({
-            'message': 'Transaction created successfully',
-            'transaction': transaction.to_dict()
-        }), 201
-        
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
+    
+    events.publish(current_user_id, {'type': 'transaction_created', 'id': transaction.id})
+    return jsonify({
+        'message': 'Transaction created successfully',
+        'transaction': transaction.to_dict()
+    }), 201
 
 
 @api_bp.route('/finance/transactions/<int:transaction_id>', methods=['DELETE'])
 @jwt_required()
 def delete_transaction(transaction_id):
-    """Delete a transaction."""
+    """Delete a transaction, whether it is still hot or already archived."""
     current_user_id = get_jwt_identity()
     
-    transaction = Transaction.query.filter_by(id=transaction_id, user_id=current_user_id).first()
+    transaction = (
+        Transaction.query.filter_by(id=transaction_id, user_id=current_user_id).first()
+        or ArchivedTransaction.query.filter_by(id=transaction_id, user_id=current_user_id).first()
+    )
     if not transaction:
         return jsonify({'error': 'Transaction not found'}), 404
     
+    FinancialGoal.apply_contribution(transaction, sign=-1)
     db.session.delete(transaction)
     db.session.commit()
+    events.publish(current_user_id, {'type': 'transaction_deleted', 'id': transaction_id})
     
     return jsonify({'message': 'Transaction deleted successfully'}), 200
 
 
+def _bulk_criteria(data, model):
+    """Build ``model`` filter clauses from a bulk request's ids and filter."""
+    criteria = []
+    if 'ids' in data:
+        criteria.append(model.id.in_(data['ids']))
+    
+    filters = data.get('filter', {})
+    if 'category_id' in filters:
+        criteria.append(model.category_id == filters['category_id'])
+    if 'goal_id' in filters:
+        criteria.append(model.goal_id == filters['goal_id'])
+    if 'type' in filters:
+        criteria.append(model.type == TransactionType(filters['type']))
+    if 'start_date' in filters:
+        criteria.append(model.date >= filters['start_date'])
+    if 'end_date' in filters:
+        criteria.append(model.date <= filters['end_date'])
+    return criteria
+
+
+@api_bp.route('/finance/transactions/bulk', methods=['PATCH'])
+@jwt_required()
+def bulk_update_transactions():
+    """Update every hot or archived transaction matching a list of ids or a filter."""
+    current_user_id = get_jwt_identity()
+    
+    try:
+        data = bulk_schema.load(request.get_json())
+        if not _bulk_criteria(data, Transaction):
+            return jsonify({'error': 'Provide ids or a filter'}), 400
+        
+        changes = bulk_changes_schema.load(data.get('changes', {}))
+        if not changes:
+            return jsonify({'error': 'No changes provided'}), 400
+        if 'type' in changes:
+            changes['type'] = TransactionType(changes['type'])
+        
+        # Validate category and goal belong to user
+        if 'category_id' in changes:
+            category = Category.query.filter_by(id=changes['category_id'], user_id=current_user_id).first()
+            if not category:
+                return jsonify({'error': 'Category not found'}), 404
+        if changes.get('goal_id') is not None:
+            goal = FinancialGoal.query.filter_by(id=changes['goal_id'], user_id=current_user_id).first()
+            if not goal:
+                return jsonify({'error': 'Goal not found'}), 404
+        
+        moves_goals = bool(CONTRIBUTION_FIELDS & changes.keys())
+        updated = 0
+        for model in (Transaction, ArchivedTransaction):
+            criteria = _bulk_criteria(data, model)
+            if moves_goals:
+                # If the update rewrites a filtered column the filter no longer
+                # matches the same rows afterwards, so pin them by id first.
+                filtered = {'date' if key.endswith('_date') else key for key in data.get('filter', {})}
+                if filtered & changes.keys():
+                    ids = db.session.scalars(
+                        db.select(model.id).where(model.user_id == current_user_id, *criteria)
+                    ).all()
+                    criteria = [model.id.in_(ids)]
+                FinancialGoal.apply_bulk_contribution(current_user_id, criteria, sign=-1, model=model)
+            
+            result = db.session.execute(
+                db.update(model)
+                .where(model.user_id == current_user_id, *criteria)
+                .values(**changes, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            updated += result.rowcount
+            
+            if moves_goals:
+                FinancialGoal.apply_bulk_contribution(current_user_id, criteria, model=model)
+        db.session.commit()
+        
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    events.publish(current_user_id, {'type': 'transactions_updated', 'count': updated})
+    return jsonify({
+        'message': 'Transactions updated successfully',
+        'updated': updated
+    }), 200
+
+
+@api_bp.route('/finance/transactions/bulk-delete', methods=['POST'])
+@jwt_required()
+def bulk_delete_transactions():
+    """Delete every hot or archived transaction matching a list of ids or a filter."""
+    current_user_id = get_jwt_identity()
+    
+    try:
+        data = bulk_schema.load(request.get_json())
+        if not _bulk_criteria(data, Transaction):
+            return jsonify({'error': 'Provide ids or a filter'}), 400
+        
+        deleted = 0
+        for model in (Transaction, ArchivedTransaction):
+            criteria = _bulk_criteria(data, model)
+            FinancialGoal.apply_bulk_contribution(current_user_id, criteria, sign=-1, model=model)
+            result = db.session.execute(
+                db.delete(model)
+                .where(model.user_id == current_user_id, *criteria)
+                .execution_options(synchronize_session=False)
+            )
+            deleted += result.rowcount
+        db.session.commit()
+        
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    events.publish(current_user_id, {'type': 'transactions_deleted', 'count': deleted})
+    return jsonify({
+        'message': 'Transactions deleted successfully',
+        'deleted': deleted
+    }), 200
+
+
 # ==================== SUMMARY ====================
 
 @api_bp.route('/finance/summary', methods=['GET'])
@@ -119,36 +319,118 @@ def get_summary():
     """Get financial summary for the current user."""
     current_user_id = get_jwt_identity()
     
-    # Get current month transactions
-    today = date.today()
-    start = date(today.year, today.month, 1)
-    if today.month == 12:
-        end = date(today.year + 1, 1, 1) - timedelta(days=1)
-    else:
-        end = date(today.year, today.month + 1, 1) - timedelta(days=1)
-    
-    transactions = Transaction.query.filter(
-        Transaction.user_id == current_user_id,
-        Transaction.date >= start,
-        Transaction.date <= end
-    ).all()
-    
-    # Calculate summary
-    total_income = sum(t.amount for t in transactions if t.type == TransactionType.INCOME)
-    total_expense = sum(t.amount for t in transactions if t.type == TransactionType.EXPENSE)
-    balance = total_income - total_expense
-    
     return jsonify({
         'message': 'Summary retrieved successfully',
-        'summary': {
-            'total_income': float(total_income),
-            'total_expense': float(total_expense),
-            'balance': float(balance),
-            'transactions_count': len(transactions)
-        }
+        'summary': monthly_summary(current_user_id)
     }), 200
 
 
+@api_bp.route('/finance/summary/stream-token', methods=['POST'])
+@jwt_required()
+def create_stream_token():
+    """Issue a short-lived token that can only open the summary stream.
+    
+    Browsers' EventSource cannot set headers, so the stream token goes in
+    the URL as ``?jwt=``, where proxies and access logs may record it.
+    Keeping it short-lived and stream-only limits what a logged URL is
+    worth; the stream stays tied to the access token it was issued from.
+    """
+    claims = get_jwt()
+    expires = current_app.config['SSE_TOKEN_EXPIRES']
+    token = create_access_token(
+        identity=get_jwt_identity(),
+        expires_delta=expires,
+        additional_claims={'scope': 'stream', 'parent_jti': claims['jti'], 'parent_exp': claims.get('exp')}
+    )
+    
+    return jsonify({
+        'token': token,
+        'expires_in': int(expires.total_seconds())
+    }), 201
+
+
+@api_bp.route('/finance/summary/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_summary():
+    """Stream summary changes for the current user as Server-Sent Events.
+    
+    The full summary is sent first; afterwards only the fields that changed
+    are sent, once per burst of transaction writes. A token passed as
+    ``?jwt=`` must be a stream token from ``POST /finance/summary/stream-token``.
+    
+    The access token is checked again on every event and heartbeat; once it
+    expires or is revoked a ``close`` event is sent and the stream ends.
+    """
+    current_user_id = get_jwt_identity()
+    claims = get_jwt()
+    config = current_app.config
+    
+    if get_jwt_request_location() == 'query_string' and claims.get('scope') != 'stream':
+        return jsonify({'error': 'Use a stream token in the query string'}), 401
+    
+    # A stream token lives as long as the access token it was issued from
+    jti = claims.get('parent_jti', claims['jti'])
+    expires_at = claims.get('parent_exp', claims.get('exp'))
+    
+    subscription = events.subscribe(
+        current_user_id, config['SSE_MAX_CONNECTIONS_PER_USER'], config['SSE_MAX_STREAMS']
+    )
+    if subscription is None:
+        return jsonify({'error': 'Too many open streams'}), 429
+    
+    def token_closed():
+        """Why the stream's token is no longer valid, or None while it is."""
+        if expires_at is not None and time.time() >= expires_at:
+            return 'expired'
+        if blocklist.is_revoked(jti):
+            return 'revoked'
+        return None
+    
+    def generate():
+        last = {}
+        changed = True
+        yield 'retry: 5000\n\n'
+        while True:
+            reason = token_closed()
+            if reason is not None:
+                db.session.rollback()
+                yield f'event: close\ndata: {json.dumps({"reason": reason})}\n\n'
+                return
+            
+            if changed:
+                summary = monthly_summary(current_user_id)
+                # Release the read transaction while the stream is idle
+                db.session.rollback()
+                delta = {key: value for key, value in summary.items() if last.get(key) != value}
+                if delta:
+                    yield f'event: summary\ndata: {json.dumps(delta)}\n\n'
+                last = summary
+            
+            events.renew(subscription)
+            
+            # Wake up no later than the token expiry
+            timeout = config['SSE_HEARTBEAT_INTERVAL']
+            if expires_at is not None:
+                timeout = max(min(timeout, expires_at - time.time()), 0)
+            try:
+                subscription.get(timeout=timeout)
+            except queue.Empty:
+                changed = False
+                yield ': heartbeat\n\n'
+                continue
+            
+            # Coalesce a burst of writes into a single recomputation
+            while not subscription.empty():
+                subscription.get_nowait()
+            changed = True
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: events.unsubscribe(current_user_id, subscription))
+    return response
+
+
 # ==================== GOALS ====================
 
 @api_bp.route('/finance/goals', methods=['GET'])
@@ -156,16 +438,26 @@ def get_summary():
 def get_goals():
     """Get all financial goals for the current user."""
     current_user_id = get_jwt_identity()
-    goals = FinancialGoal.query.filter_by(user_id=current_user_id).all()
+    
+    try:
+        fields = _requested_fields(FinancialGoal.__table__.columns.keys())
+    except ValidationError as e:
+        return jsonify({'error': 'Validation error', 'details': e.messages}), 400
+    
+    if fields:
+        goals = _select_fields(FinancialGoal, fields, current_user_id)
+    else:
+        goals = [goal.to_dict() for goal in FinancialGoal.query.filter_by(user_id=current_user_id).all()]
     
     return jsonify({
         'message': 'Goals retrieved successfully',
-        'goals': [goal.to_dict() for goal in goals]
+        'goals': goals
     }), 200
 
 
 @api_bp.route('/finance/goals', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_goal():
     """Create a new financial goal."""
     current_user_id = get_jwt_identity()
@@ -174,7 +466,20 @@ def create_goal():
         data = request.get_json()
         data['user_id'] = current_user_id
         
+        # Validate category belongs to user
+        if data.get('category_id') is not None:
+            category = Category.query.filter_by(id=data['category_id'], user_id=current_user_id).first()
+            if not category:
+                return jsonify({'error': 'Category not found'}), 404
+        
+        # The client-supplied amount is the starting point; linked
+        # transactions are added on top of it from here on.
+        data['initial_amount'] = Decimal(str(data.pop('current_amount', 0) or 0))
+        data['target_amount'] = Decimal(str(data['target_amount']))
+        data.pop('progress', None)
+        
         goal = FinancialGoal(**data)
+        goal.reconcile()
         db.session.add(goal)
         db.session.commit()
         
@@ -0,0 +1,61 @@
+from flask import request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.routes import api_bp
+from app.models.job import Job
+from app.services.jobs import enqueue, tasks
+
+
+@api_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def create_job():
+    """Queue a background job for the current user."""
+    current_user_id = get_jwt_identity()
+    
+    data = request.get_json() or {}
+    if data.get('name') not in tasks:
+        return jsonify({'error': 'Unknown job', 'available': sorted(tasks)}), 400
+    
+    payload = data.get('payload') or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Payload must be an object'}), 400
+    
+    job = enqueue(data['name'], payload, user_id=current_user_id)
+    
+    return jsonify({
+        'message': 'Job queued successfully',
+        'job': job.to_dict()
+    }), 202
+
+
+@api_bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Get the status of a job."""
+    current_user_id = get_jwt_identity()
+    
+    job = Job.query.filter_by(id=job_id, user_id=current_user_id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'job': job.to_dict()
+    }), 200
+
+
+@api_bp.route('/jobs/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    """Get the result of a finished job."""
+    current_user_id = get_jwt_identity()
+    
+    job = Job.query.filter_by(id=job_id, user_id=current_user_id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if not job.is_finished:
+        return jsonify({'error': 'Job not finished', 'job': job.to_dict()}), 409
+    
+    return jsonify({
+        'job': job.to_dict(),
+        'result': job.result
+    }), 200
@@ -1,2 +1,5 @@
 from .user import UserSchema, UserLoginSchema, UserRegisterSchema
-from .finance import CategorySchema, TransactionSchema, FinancialGoalSchema, TransactionSummarySchema 
\ No newline at end of file
+from .finance import (
+    CategorySchema, TransactionSchema, TransactionFilterSchema, TransactionBulkSchema,
+    FinancialGoalSchema, TransactionSummarySchema
+) 
\ No newline at end of file
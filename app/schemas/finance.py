@@ -21,6 +21,7 @@ class TransactionSchema(Schema):
     amount = fields.Float(required=True)
     type = fields.Str(required=True, validate=validate.OneOf(['income', 'expense']))
     category_id = fields.Int(required=True)
+    goal_id = fields.Int(allow_none=True)
     user_id = fields.Int(dump_only=True)
     date = fields.Date()
     notes = fields.Str(allow_none=True)
@@ -31,12 +32,30 @@ class TransactionSchema(Schema):
     updated_at = fields.DateTime(dump_only=True)
 
 
+class TransactionFilterSchema(Schema):
+    """Schema for selecting transactions in bulk operations."""
+    category_id = fields.Int()
+    goal_id = fields.Int(allow_none=True)
+    type = fields.Str(validate=validate.OneOf(['income', 'expense']))
+    start_date = fields.Date()
+    end_date = fields.Date()
+
+
+class TransactionBulkSchema(Schema):
+    """Schema for bulk transaction update and delete requests."""
+    ids = fields.List(fields.Int(), validate=validate.Length(min=1))
+    filter = fields.Nested(TransactionFilterSchema)
+    changes = fields.Dict()
+
+
 class FinancialGoalSchema(Schema):
     """Schema for financial goal validation."""
     id = fields.Int(dump_only=True)
     name = fields.Str(required=True)
     target_amount = fields.Float(required=True)
+    initial_amount = fields.Float(dump_only=True)
     current_amount = fields.Float()
+    category_id = fields.Int(allow_none=True)
     deadline = fields.Date(allow_none=True)
     description = fields.Str(allow_none=True)
     user_id = fields.Int(dump_only=True)
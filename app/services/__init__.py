@@ -0,0 +1,5 @@
+from .rate_limit import RateLimiter, limiter
+from .token_blocklist import TokenBlocklist, blocklist
+from .jobs import enqueue, run_worker, task
+from .idempotency import idempotent
+from .events import EventBroker, events
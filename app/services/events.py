@@ -0,0 +1,254 @@
+import itertools
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Delivers events to subscribers in the current process only."""
+    
+    def __init__(self, broker):
+        self.broker = broker
+        self._stream_ids = itertools.count(1)
+    
+    def publish(self, user_id, event):
+        self.broker.dispatch(user_id, event)
+    
+    def start(self):
+        pass
+    
+    # With a single process the broker's own per-user count is the limit
+    def claim_stream(self, user_id, limit, ttl):
+        return next(self._stream_ids)
+    
+    def renew_stream(self, stream_id, ttl):
+        pass
+    
+    def release_stream(self, stream_id):
+        pass
+
+
+class SQLiteBackend:
+    """Relays events between workers through a SQLite file.
+    
+    ``publish`` appends a row; a daemon thread in every worker polls for
+    new rows and hands them to that worker's subscribers. Open streams are
+    registered in a ``streams`` table so the per-user limit spans workers;
+    rows of streams whose worker died expire after their ``ttl``.
+    """
+    
+    retention = 60  # seconds an event row is kept
+    
+    def __init__(self, broker, path, poll_interval=0.5):
+        self.broker = broker
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._thread = None
+        self._lock = threading.Lock()
+        with closing(sqlite3.connect(path, timeout=5)) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+                'payload TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS streams ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+                'expires_at REAL NOT NULL)'
+            )
+            conn.commit()
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    def publish(self, user_id, event):
+        self._connect().execute(
+            'INSERT INTO events (user_id, payload, created_at) VALUES (?, ?, ?)',
+            (user_id, json.dumps(event), time.time())
+        )
+    
+    def claim_stream(self, user_id, limit, ttl):
+        """Register a stream of ``user_id``; None if they already have ``limit``."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM streams WHERE expires_at < ?', (now,))
+            count = conn.execute('SELECT COUNT(*) FROM streams WHERE user_id = ?', (user_id,)).fetchone()[0]
+            stream_id = None
+            if count < limit:
+                stream_id = conn.execute(
+                    'INSERT INTO streams (user_id, expires_at) VALUES (?, ?)', (user_id, now + ttl)
+                ).lastrowid
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return stream_id
+    
+    def renew_stream(self, stream_id, ttl):
+        self._connect().execute('UPDATE streams SET expires_at = ? WHERE id = ?', (time.time() + ttl, stream_id))
+    
+    def release_stream(self, stream_id):
+        self._connect().execute('DELETE FROM streams WHERE id = ?', (stream_id,))
+    
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll, name='events-poller', daemon=True)
+                self._thread.start()
+    
+    def _poll(self):
+        """Relay new rows to this worker's subscribers, forever.
+        
+        Errors such as a transient "database is locked" are logged and the
+        connection reopened, so existing streams keep receiving events.
+        """
+        last_id = None
+        next_prune = 0
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                conn = self._connect()
+                if last_id is None:
+                    last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+                rows = conn.execute(
+                    'SELECT id, user_id, payload FROM events WHERE id > ? ORDER BY id', (last_id,)
+                ).fetchall()
+                for event_id, user_id, payload in rows:
+                    self.broker.dispatch(user_id, json.loads(payload))
+                    last_id = event_id
+                
+                now = time.time()
+                if now >= next_prune:
+                    next_prune = now + self.retention
+                    conn.execute('DELETE FROM events WHERE created_at < ?', (now - self.retention,))
+            except Exception:
+                logger.exception('Events poller failed; reconnecting')
+                self._reconnect()
+    
+    def _reconnect(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+
+class Subscription(queue.Queue):
+    """Queue of one open stream's events, registered with the backend as ``stream_id``."""
+    
+    def __init__(self, stream_id=None):
+        super().__init__(maxsize=100)
+        self.stream_id = stream_id
+
+
+class EventBroker:
+    """Per-user pub/sub feeding the finance SSE stream."""
+    
+    def __init__(self, app=None):
+        self.backend = None
+        self.stream_ttl = 45
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        backend = app.config.get('EVENTS_BACKEND', 'memory')
+        if backend == 'sqlite':
+            path = app.config.get('EVENTS_STORAGE_PATH') or os.path.join(app.instance_path, 'events.db')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(self, path, app.config.get('EVENTS_POLL_INTERVAL', 0.5))
+        elif backend == 'memory':
+            self.backend = MemoryBackend(self)
+        else:
+            raise ValueError(f'Unknown events backend: {backend}')
+        # A stream missing three heartbeats no longer counts against the limit
+        self.stream_ttl = 3 * app.config.get('SSE_HEARTBEAT_INTERVAL', 15)
+        app.extensions['events'] = self
+    
+    def subscribe(self, user_id, max_connections, max_streams):
+        """Return a queue receiving the user's events, or None if at a limit.
+        
+        ``max_connections`` caps the user's streams across all workers and
+        ``max_streams`` the streams held open by this process.
+        """
+        with self._lock:
+            subscribers = self._subscribers.setdefault(user_id, set())
+            total = sum(len(streams) for streams in self._subscribers.values())
+            if len(subscribers) >= max_connections or total >= max_streams:
+                return None
+            subscription = Subscription()
+            subscribers.add(subscription)
+        
+        try:
+            subscription.stream_id = self.backend.claim_stream(user_id, max_connections, self.stream_ttl)
+        except Exception:
+            logger.exception('Failed to register a stream for user %s', user_id)
+        if subscription.stream_id is None:
+            self.unsubscribe(user_id, subscription)
+            return None
+        self.backend.start()
+        return subscription
+    
+    def renew(self, subscription):
+        """Keep an open stream counted against its user's limit."""
+        try:
+            self.backend.renew_stream(subscription.stream_id, self.stream_ttl)
+        except Exception:
+            logger.exception('Failed to renew stream %s', subscription.stream_id)
+    
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+        if subscription.stream_id is not None:
+            try:
+                self.backend.release_stream(subscription.stream_id)
+            except Exception:
+                logger.exception('Failed to release stream %s', subscription.stream_id)
+            subscription.stream_id = None
+    
+    def publish(self, user_id, event):
+        """Announce a change to every stream of ``user_id``, in any worker.
+        
+        Called after the change has committed, so a failure here is only
+        logged: streams catch up on their next event or reconnect.
+        """
+        try:
+            self.backend.publish(user_id, event)
+        except Exception:
+            logger.exception('Failed to publish %s event for user %s', event.get('type'), user_id)
+    
+    def dispatch(self, user_id, event):
+        """Hand an event to this process's subscribers of ``user_id``."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                # The stream coalesces events anyway, so dropping is harmless
+                pass
+
+
+events = EventBroker()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request, jsonify, make_response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app.models.user import db
+from app.models.idempotency import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+
+# Expired keys are evicted on every Nth new key stored by this process
+_evict_every = 100
+_stored = 0
+
+
+def _evict_expired(now):
+    global _stored
+    _stored += 1
+    if _stored % _evict_every == 0:
+        IdempotencyKey.query.filter(IdempotencyKey.expires_at < now).delete()
+
+
+def _request_hash():
+    """Fingerprint of the request's URL arguments and body.
+    
+    JSON bodies are normalized first, so a retry that only reorders keys or
+    changes whitespace still matches.
+    """
+    body = request.get_data()
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode()
+    except ValueError:
+        pass
+    view_args = json.dumps(request.view_args or {}, sort_keys=True, default=str).encode()
+    return hashlib.sha256(view_args + b'\n' + body).hexdigest()
+
+
+def _reserve(user_id, key, request_hash, now):
+    """Insert the in-progress row for a key; return it, or None if taken."""
+    config = current_app.config
+    record = IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        endpoint=request.endpoint,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=now + config['IDEMPOTENCY_KEY_TTL']
+    )
+    try:
+        db.session.add(record)
+        _evict_expired(now)
+        db.session.commit()
+        return record
+    except IntegrityError:
+        db.session.rollback()
+        return None
+
+
+def _replay(record):
+    response = current_app.response_class(
+        record.response_body,
+        status=record.status_code,
+        mimetype='application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Store the first response per user and ``Idempotency-Key`` and replay it.
+    
+    Must be applied below ``@jwt_required()``. Requests without the header
+    run as usual. A retry of a finished request gets the stored response
+    without running the view; a retry that arrives while the first request
+    is still running waits for it, up to ``IDEMPOTENCY_WAIT_TIMEOUT``. A key
+    reused for another endpoint or a different body gets a 422.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': f'{HEADER} too long'}), 400
+        
+        config = current_app.config
+        current_user_id = get_jwt_identity()
+        request_hash = _request_hash()
+        deadline = time.monotonic() + config['IDEMPOTENCY_WAIT_TIMEOUT']
+        
+        while True:
+            now = datetime.utcnow()
+            record = _reserve(current_user_id, key, request_hash, now)
+            if record is not None:
+                break
+            
+            existing = IdempotencyKey.query.filter_by(user_id=current_user_id, key=key).first()
+            if existing is None:
+                db.session.rollback()
+                continue
+            # Keep the loaded row but end the read transaction before waiting
+            db.session.expunge(existing)
+            db.session.rollback()
+            if existing.endpoint != request.endpoint:
+                return jsonify({'error': f'{HEADER} already used for another request'}), 422
+            # Rows stored before bodies were hashed have no hash to compare
+            if existing.request_hash is not None and existing.request_hash != request_hash:
+                return jsonify({'error': f'{HEADER} already used with a different request body'}), 422
+            
+            abandoned = existing.created_at < now - timedelta(seconds=config['IDEMPOTENCY_LOCK_TIMEOUT'])
+            if existing.expires_at < now or (not existing.is_complete and abandoned):
+                IdempotencyKey.query.filter_by(id=existing.id).delete()
+                db.session.commit()
+                continue
+            if existing.is_complete:
+                return _replay(existing)
+            
+            if time.monotonic() >= deadline:
+                return jsonify({'error': 'A request with this key is still in progress'}), 409
+            time.sleep(config['IDEMPOTENCY_POLL_INTERVAL'])
+        
+        record_id = record.id
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(id=record_id).delete()
+            db.session.commit()
+            raise
+        
+        # Server errors are not stored so the client can retry them
+        if response.status_code >= 500:
+            IdempotencyKey.query.filter_by(id=record_id).delete()
+        else:
+            IdempotencyKey.query.filter_by(id=record_id).update({
+                'status_code': response.status_code,
+                'response_body': response.get_data(as_text=True)
+            })
+        db.session.commit()
+        return response
+    return wrapper
@@ -0,0 +1,269 @@
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from flask import current_app
+from marshmallow import ValidationError
+from app.models.user import db
+from app.models.job import Job, JobStatus
+from app.models.finance import Category, Transaction, FinancialGoal, TransactionType, query_transactions
+from app.models.sharding import use_user_shard
+from app.schemas.finance import TransactionSchema
+from app.services.events import events
+
+
+logger = logging.getLogger(__name__)
+
+# Registered task functions, keyed by job name
+tasks = {}
+
+
+def task(name):
+    """Register a function as a job task.
+    
+    Tasks are called as ``func(user_id, **payload)`` inside an app context
+    and must return a JSON-serializable result.
+    """
+    def decorator(func):
+        tasks[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, user_id=None):
+    """Store a new queued job and return it."""
+    if name not in tasks:
+        raise ValueError(f'Unknown job: {name}')
+    
+    job = Job(name=name, payload=payload or {}, user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def requeue_stale(lease_timeout, max_attempts):
+    """Recover running jobs whose worker died before finishing them.
+    
+    Workers renew a job's lease while it runs, so a running job whose lease
+    has lapsed is abandoned. It is queued again, or failed once it has been
+    claimed ``max_attempts`` times. Jobs claimed before leases existed use
+    ``started_at`` plus ``lease_timeout``. Returns the number of jobs
+    requeued and failed.
+    """
+    now = datetime.utcnow()
+    stale = db.and_(
+        Job.status == JobStatus.RUNNING,
+        db.or_(
+            Job.lease_expires_at < now,
+            db.and_(
+                Job.lease_expires_at.is_(None),
+                Job.started_at < now - timedelta(seconds=lease_timeout)
+            )
+        )
+    )
+    failed = db.session.execute(
+        db.update(Job)
+        .where(stale, Job.attempts >= max_attempts)
+        .values(
+            status=JobStatus.FAILED,
+            error=f'Lease expired after {max_attempts} attempts',
+            finished_at=datetime.utcnow()
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    requeued = db.session.execute(
+        db.update(Job)
+        .where(stale)
+        .values(status=JobStatus.QUEUED, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return requeued, failed
+
+
+def claim_next(lease_timeout=600):
+    """Atomically mark the oldest queued job as running and return it.
+    
+    The claim holds a lease of ``lease_timeout`` seconds, which ``run_job``
+    keeps renewing while the task runs.
+    """
+    while True:
+        job_id = db.session.scalar(
+            db.select(Job.id).where(Job.status == JobStatus.QUEUED).order_by(Job.id).limit(1)
+        )
+        if job_id is None:
+            db.session.rollback()
+            return None
+        
+        # Only one worker wins the conditional UPDATE; the others retry
+        claimed = db.session.execute(
+            db.update(Job)
+            .where(Job.id == job_id, Job.status == JobStatus.QUEUED)
+            .values(
+                status=JobStatus.RUNNING,
+                started_at=datetime.utcnow(),
+                lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_timeout),
+                attempts=Job.attempts + 1
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+
+
+def _held_by(job_id, attempts):
+    """Filter matching a job only while the claim numbered ``attempts`` holds it."""
+    return db.and_(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.attempts == attempts)
+
+
+def _renew_lease(app, job_id, attempts, lease_timeout, stop):
+    """Extend a running job's lease every third of ``lease_timeout`` until ``stop`` is set."""
+    with app.app_context():
+        while not stop.wait(lease_timeout / 3):
+            try:
+                db.session.execute(
+                    db.update(Job)
+                    .where(_held_by(job_id, attempts))
+                    .values(lease_expires_at=datetime.utcnow() + timedelta(seconds=lease_timeout))
+                    .execution_options(synchronize_session=False)
+                )
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.exception('Failed to renew the lease of job %s', job_id)
+        db.session.remove()
+
+
+def run_job(job, lease_timeout=600):
+    """Run a claimed job and store its result or error.
+    
+    A background thread renews the job's lease while the task runs, so
+    long jobs are not requeued. The outcome is only stored while this
+    worker still holds the job; if its lease lapsed anyway (the worker was
+    stalled) and the job was requeued, the late result is dropped.
+    """
+    job_id, attempts = job.id, job.attempts
+    stop = threading.Event()
+    renewer = threading.Thread(
+        target=_renew_lease,
+        args=(current_app._get_current_object(), job_id, attempts, lease_timeout, stop),
+        name=f'job-{job_id}-lease',
+        daemon=True
+    )
+    renewer.start()
+    try:
+        with use_user_shard(job.user_id):
+            result = tasks[job.name](job.user_id, **(job.payload or {}))
+        outcome = {'result': result, 'status': JobStatus.SUCCEEDED}
+    except Exception as e:
+        db.session.rollback()
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        outcome = {'error': error, 'status': JobStatus.FAILED}
+    finally:
+        stop.set()
+        renewer.join()
+    
+    db.session.execute(
+        db.update(Job)
+        .where(_held_by(job_id, attempts))
+        .values(**outcome, finished_at=datetime.utcnow(), lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_worker(app, threads=2, poll_interval=1.0, burst=False, lease_timeout=600, max_attempts=3):
+    """Process jobs on a pool of threads.
+    
+    Each thread polls the ``jobs`` table every ``poll_interval`` seconds
+    while idle. With ``burst`` the threads exit once the queue is empty.
+    Jobs whose lease of ``lease_timeout`` seconds lapsed are requeued (see
+    ``requeue_stale``), checked on start and then once per lease period.
+    
+    Database errors (e.g. "database is locked" with several worker
+    processes on SQLite) are logged and the thread carries on after
+    ``poll_interval``; a job whose outcome could not be stored is
+    requeued once its lease lapses.
+    """
+    def work():
+        with app.app_context():
+            next_recovery = 0
+            while True:
+                try:
+                    if time.time() >= next_recovery:
+                        requeue_stale(lease_timeout, max_attempts)
+                        next_recovery = time.time() + lease_timeout
+                    
+                    job = claim_next(lease_timeout)
+                    if job is None:
+                        if burst:
+                            return
+                        time.sleep(poll_interval)
+                        continue
+                    run_job(job, lease_timeout)
+                except Exception:
+                    logger.exception('Job worker error; retrying')
+                    db.session.rollback()
+                    time.sleep(poll_interval)
+                finally:
+                    db.session.remove()
+    
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(work) for _ in range(threads)]:
+            future.result()
+
+
+# ==================== TASKS ====================
+
+@task('export_transactions')
+def export_transactions(user_id, start_date=None, end_date=None):
+    """Export a user's transactions, optionally limited to a date range."""
+    start = date.fromisoformat(start_date) if start_date else None
+    end = date.fromisoformat(end_date) if end_date else None
+    return [transaction.to_dict() for transaction in query_transactions(user_id, start, end)]
+
+
+@task('import_transactions')
+def import_transactions(user_id, transactions=()):
+    """Validate and insert a list of transactions in one commit."""
+    rows = TransactionSchema(many=True).load(list(transactions))
+    
+    category_ids = {row['category_id'] for row in rows}
+    owned = set(db.session.scalars(
+        db.select(Category.id).where(Category.user_id == user_id, Category.id.in_(category_ids))
+    ))
+    if category_ids - owned:
+        raise ValidationError({'category_id': [f'Unknown categories: {sorted(category_ids - owned)}']})
+    
+    goal_ids = {row['goal_id'] for row in rows if row.get('goal_id') is not None}
+    owned = set(db.session.scalars(
+        db.select(FinancialGoal.id).where(FinancialGoal.user_id == user_id, FinancialGoal.id.in_(goal_ids))
+    ))
+    if goal_ids - owned:
+        raise ValidationError({'goal_id': [f'Unknown goals: {sorted(goal_ids - owned)}']})
+    
+    new_transactions = []
+    for row in rows:
+        row['type'] = TransactionType(row['type'])
+        new_transactions.append(Transaction(user_id=user_id, **row))
+    db.session.add_all(new_transactions)
+    db.session.flush()
+    
+    ids = [transaction.id for transaction in new_transactions]
+    FinancialGoal.apply_bulk_contribution(user_id, [Transaction.id.in_(ids)])
+    db.session.commit()
+    events.publish(user_id, {'type': 'transactions_imported', 'count': len(ids)})
+    return {'imported': len(ids)}
+
+
+@task('reconcile_goals')
+def reconcile_goals(user_id):
+    """Rebuild a user's goal amounts and progress from their transactions."""
+    goals = FinancialGoal.query.filter_by(user_id=user_id).all()
+    for goal in goals:
+        goal.reconcile()
+    db.session.commit()
+    return {'goals': len(goals)}
@@ -0,0 +1,179 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from functools import wraps
+from flask import current_app, request, jsonify
+
+
+def take_token(tokens, updated_at, capacity, rate, now):
+    """Refill a token bucket and try to take one token from it.
+    
+    Returns ``(tokens, allowed, retry_after)`` where ``tokens`` is the new
+    bucket level and ``retry_after`` the seconds until a token is available.
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+    
+    if tokens >= 1:
+        return tokens - 1, True, 0
+    return tokens, False, (1 - tokens) / rate
+
+
+def full_at(tokens, capacity, rate, now):
+    """When a bucket at ``tokens`` will have refilled to ``capacity``.
+    
+    From then on the bucket is the same as a fresh one, so it can be
+    dropped without letting anyone past their limit.
+    """
+    return now + (capacity - tokens) / rate
+
+
+class MemoryBackend:
+    """Token buckets kept in the current process."""
+    
+    max_keys = 10000
+    
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+    
+    def consume(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (None, now, now))
+            tokens, allowed, retry_after = take_token(tokens, updated_at, capacity, rate, now)
+            self._buckets[key] = (tokens, now, full_at(tokens, capacity, rate, now))
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return allowed, retry_after
+    
+    def _prune(self, now):
+        """Drop buckets that have been idle long enough to be full again.
+        
+        Each bucket keeps its own refill horizon, so scopes with different
+        capacities and rates can share the store.
+        """
+        self._buckets = {
+            key: state for key, state in self._buckets.items()
+            if state[2] > now
+        }
+
+
+class SQLiteBackend:
+    """Token buckets shared by every worker through a SQLite file."""
+    
+    prune_every = 1000
+    
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+        # Use a throwaway connection so no handle leaks into forked workers
+        with closing(sqlite3.connect(path, timeout=5)) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limit_buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL)'
+            )
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(rate_limit_buckets)')}
+            if 'full_at' not in columns:
+                # Older rows stay until their key is used again and rewritten
+                conn.execute('ALTER TABLE rate_limit_buckets ADD COLUMN full_at REAL')
+            conn.commit()
+    
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+    
+    def consume(self, key, capacity, rate, now):
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front, so the read and the
+        # update below are atomic across processes.
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)
+            ).fetchone()
+            tokens, updated_at = row if row else (None, now)
+            tokens, allowed, retry_after = take_token(tokens, updated_at, capacity, rate, now)
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, full_at(tokens, capacity, rate, now))
+            )
+            self._calls += 1
+            if self._calls % self.prune_every == 0:
+                conn.execute('DELETE FROM rate_limit_buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+
+class RateLimiter:
+    """Token-bucket rate limiter keyed by client IP and username."""
+    
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        backend = app.config.get('RATELIMIT_BACKEND', 'memory')
+        if backend == 'sqlite':
+            path = app.config.get('RATELIMIT_STORAGE_PATH') or os.path.join(app.instance_path, 'ratelimit.db')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.backend = SQLiteBackend(path)
+        elif backend == 'memory':
+            self.backend = MemoryBackend()
+        else:
+            raise ValueError(f'Unknown rate limit backend: {backend}')
+        app.extensions['rate_limiter'] = self
+    
+    def _keys(self, scope):
+        keys = [f'{scope}:ip:{request.remote_addr}']
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and isinstance(data.get('username'), str):
+            keys.append(f'{scope}:user:{data["username"].strip().lower()}')
+        return keys
+    
+    def limit(self, scope):
+        """Reject over-limit requests with 429 before the view runs.
+        
+        Bucket size and refill rate are read from ``RATELIMIT_<SCOPE>_CAPACITY``
+        and ``RATELIMIT_<SCOPE>_REFILL_RATE`` (tokens per second).
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                config = current_app.config
+                if not config.get('RATELIMIT_ENABLED', True):
+                    return view(*args, **kwargs)
+                
+                capacity = config[f'RATELIMIT_{scope.upper()}_CAPACITY']
+                rate = config[f'RATELIMIT_{scope.upper()}_REFILL_RATE']
+                now = time.time()
+                
+                retry_after = 0
+                for key in self._keys(scope):
+                    allowed, wait = self.backend.consume(key, capacity, rate, now)
+                    if not allowed:
+                        retry_after = max(retry_after, wait)
+                
+                if retry_after:
+                    response = jsonify({'error': 'Too many requests'})
+                    response.headers['Retry-After'] = str(math.ceil(retry_after))
+                    return response, 429
+                
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
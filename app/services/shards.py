@@ -0,0 +1,88 @@
+from app.models.user import db
+from app.models.finance import Category, Transaction, ArchivedTransaction, FinancialGoal
+from app.models.sharding import shard_for
+
+
+categories = Category.__table__
+goals = FinancialGoal.__table__
+transactions = Transaction.__table__
+archive = ArchivedTransaction.__table__
+SHARDED_TABLES = (categories, goals, transactions, archive)
+
+
+def misplaced_users(source):
+    """User ids with rows in ``source`` that the shard map places elsewhere.
+    
+    ``source`` may be ``None``, the main database, which holds every
+    user's data from before sharding was turned on.
+    """
+    user_ids = set()
+    with db.engines[source].connect() as conn:
+        for table in SHARDED_TABLES:
+            user_ids.update(conn.execute(db.select(table.c.user_id).distinct()).scalars())
+    return sorted(user_id for user_id in user_ids if shard_for(user_id) != source)
+
+
+def count_rows(key):
+    """Row count of every sharded table in shard ``key``."""
+    with db.engines[key].connect() as conn:
+        return {
+            table.name: conn.execute(db.select(db.func.count()).select_from(table)).scalar()
+            for table in SHARDED_TABLES
+        }
+
+
+def move_user(user_id, source, target):
+    """Copy a user's finance rows from ``source`` to ``target``, then delete them.
+    
+    Rows keep their ids, which come from the global sequences in
+    ``IdSequence``, so ids held by clients, stored idempotent responses and
+    queued jobs still point at the same rows. Raises ``ValueError``
+    without moving anything if one of the ids is already taken in the
+    target, which only happens with rows written before the sequences
+    existed. Returns the number of rows moved per table.
+    
+    The source is write-locked for the whole move (``BEGIN IMMEDIATE`` on
+    SQLite, ``SELECT ... FOR UPDATE`` elsewhere), so writes made there by
+    servers still on the old shard map wait or fail instead of being lost.
+    Only the copied rows are deleted; anything that slips in is left for
+    the next rebalance.
+    """
+    with db.engines[source].begin() as src:
+        if src.dialect.name == 'sqlite':
+            src.exec_driver_sql('BEGIN IMMEDIATE')
+        
+        rows = {
+            table: [dict(row) for row in src.execute(
+                db.select(table).where(table.c.user_id == user_id).with_for_update()
+            ).mappings()]
+            for table in SHARDED_TABLES
+        }
+        ids = {table: [row['id'] for row in rows[table]] for table in SHARDED_TABLES}
+        
+        with db.engines[target].begin() as dst:
+            # Hot and archived transactions share one id space
+            claimed = {
+                categories: ids[categories],
+                goals: ids[goals],
+                transactions: ids[transactions] + ids[archive],
+                archive: ids[transactions] + ids[archive]
+            }
+            for table, table_ids in claimed.items():
+                taken = dst.execute(
+                    db.select(table.c.id).where(table.c.id.in_(table_ids)).limit(10)
+                ).scalars().all()
+                if taken:
+                    raise ValueError(
+                        f'{table.name} ids {taken} of user {user_id} already exist in {target}'
+                    )
+            
+            for table in SHARDED_TABLES:
+                if rows[table]:
+                    dst.execute(db.insert(table), rows[table])
+        
+        # The target has committed; only now drop the rows that were copied
+        for table in reversed(SHARDED_TABLES):
+            src.execute(db.delete(table).where(table.c.id.in_(ids[table])))
+    
+    return {table.name: len(rows[table]) for table in SHARDED_TABLES}
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from app.models.user import db
+from app.models.token import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over string keys."""
+    
+    def __init__(self, capacity, hashes=7):
+        # ~10 bits per key keeps false positives around 1% with 7 hashes
+        self.size = max(capacity * 10, 1024)
+        self.hashes = hashes
+        self._bits = bytearray(self.size // 8 + 1)
+    
+    def _positions(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[i * 4:i * 4 + 4], 'big') % self.size
+    
+    def add(self, key):
+        for position in self._positions(key):
+            self._bits[position // 8] |= 1 << (position % 8)
+    
+    def __contains__(self, key):
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(key))
+
+
+class TokenBlocklist:
+    """In-memory view of the ``revoked_tokens`` table.
+    
+    Lookups hit a bloom filter first and only consult the exact set on a
+    possible match, so checking an unrevoked token does no DB work. Rows
+    revoked by other workers are pulled in incrementally at most once every
+    ``JWT_BLOCKLIST_SYNC_INTERVAL`` seconds, and expired entries are dropped
+    every ``JWT_BLOCKLIST_PRUNE_INTERVAL`` seconds.
+    """
+    
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self._bloom = BloomFilter(capacity)
+        self._expiry = {}
+        self._last_id = 0
+        self._next_sync = 0
+        self._next_prune = 0
+        self._lock = threading.Lock()
+    
+    def _add(self, jti, expires_at):
+        self._expiry[jti] = expires_at
+        if len(self._expiry) > self.capacity:
+            self.capacity *= 2
+            self._rebuild()
+        else:
+            self._bloom.add(jti)
+    
+    def _rebuild(self):
+        bloom = BloomFilter(self.capacity)
+        for jti in self._expiry:
+            bloom.add(jti)
+        self._bloom = bloom
+    
+    def sync(self, force=False):
+        """Load rows revoked since the last sync and prune expired ones."""
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        
+        with self._lock:
+            if not force and now < self._next_sync:
+                return
+            config = current_app.config
+            self._next_sync = now + config.get('JWT_BLOCKLIST_SYNC_INTERVAL', 2)
+            
+            utcnow = datetime.utcnow()
+            rows = db.session.execute(
+                db.select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+                .where(RevokedToken.id > self._last_id, RevokedToken.expires_at > utcnow)
+                .order_by(RevokedToken.id)
+            ).all()
+            for row in rows:
+                self._add(row.jti, row.expires_at)
+            if rows:
+                self._last_id = rows[-1].id
+            
+            if now >= self._next_prune:
+                self._next_prune = now + config.get('JWT_BLOCKLIST_PRUNE_INTERVAL', 600)
+                self._expiry = {jti: exp for jti, exp in self._expiry.items() if exp > utcnow}
+                self._rebuild()
+    
+    def is_revoked(self, jti):
+        self.sync()
+        if jti not in self._bloom:
+            return False
+        return jti in self._expiry
+    
+    def revoke(self, decoded_token):
+        """Persist a decoded JWT as revoked and block it in this worker."""
+        expires_at = datetime.utcfromtimestamp(decoded_token['exp'])
+        if not RevokedToken.query.filter_by(jti=decoded_token['jti']).first():
+            db.session.add(RevokedToken(
+                jti=decoded_token['jti'],
+                token_type=decoded_token['type'],
+                user_id=decoded_token[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')],
+                expires_at=expires_at
+            ))
+        with self._lock:
+            self._add(decoded_token['jti'], expires_at)
+
+
+def prune_revoked_tokens():
+    """Delete revoked-token rows whose tokens have expired anyway."""
+    deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+    db.session.commit()
+    return deleted
+
+
+blocklist = TokenBlocklist()
@@ -1,7 +1,14 @@
+import json
 import os
 from datetime import timedelta
 
 
+def _shard_binds():
+    """Binds ``shard_0`` ... ``shard_N`` from the comma-separated SHARD_URLS."""
+    urls = [url.strip() for url in os.environ.get('SHARD_URLS', '').split(',') if url.strip()]
+    return {f'shard_{index}': url for index, url in enumerate(urls)}
+
+
 class Config:
     """Configuração base para todos os ambientes."""
     
@@ -12,10 +19,18 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Configurações de sharding dos dados financeiros por usuário
+    # (sem SHARD_URLS tudo fica no banco principal)
+    SQLALCHEMY_BINDS = _shard_binds()
+    SHARD_KEYS = list(SQLALCHEMY_BINDS)
+    SHARD_MAP = json.loads(os.environ.get('SHARD_MAP', '{}'))  # {"<user_id>": "shard_N"}
+    
     # Configurações JWT
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+    JWT_BLOCKLIST_SYNC_INTERVAL = 2  # segundos entre sincronizações da blocklist
+    JWT_BLOCKLIST_PRUNE_INTERVAL = 600  # segundos entre limpezas de tokens expirados
     
     # Configurações de logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -31,6 +46,43 @@ class Config:
     CACHE_TYPE = os.environ.get('CACHE_TYPE', 'simple')
     CACHE_DEFAULT_TIMEOUT = 300
     
+    # Configurações de arquivamento de transações antigas
+    ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+    ARCHIVE_BATCH_SIZE = 1000
+    
+    # Configurações de Idempotency-Key
+    IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+    IDEMPOTENCY_WAIT_TIMEOUT = 10  # segundos esperando a requisição original
+    IDEMPOTENCY_LOCK_TIMEOUT = 60  # segundos até considerar a requisição original abandonada
+    IDEMPOTENCY_POLL_INTERVAL = 0.05
+    
+    # Configurações do stream de eventos (SSE)
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'memory')
+    EVENTS_STORAGE_PATH = os.environ.get('EVENTS_STORAGE_PATH')
+    EVENTS_POLL_INTERVAL = 0.5  # segundos
+    SSE_HEARTBEAT_INTERVAL = 15  # segundos
+    SSE_TOKEN_EXPIRES = timedelta(seconds=60)  # validade do token do ?jwt= para abrir o stream
+    SSE_MAX_CONNECTIONS_PER_USER = 3  # somando todos os workers
+    # Streams abertos por processo; cada um ocupa uma thread do gunicorn,
+    # então deve ficar abaixo de --threads para sobrar thread para a API
+    SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 8))
+    
+    # Configurações da fila de jobs em background
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 2))
+    JOB_POLL_INTERVAL = 1.0  # segundos
+    JOB_LEASE_TIMEOUT = int(os.environ.get('JOB_LEASE_TIMEOUT', 600))  # segundos até um job em execução ser considerado abandonado
+    JOB_MAX_ATTEMPTS = 3  # tentativas antes de marcar um job abandonado como falho
+    
+    # Configurações de rate limiting (token bucket)
+    RATELIMIT_ENABLED = True
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'memory')
+    RATELIMIT_STORAGE_PATH = os.environ.get('RATELIMIT_STORAGE_PATH')
+    RATELIMIT_AUTH_CAPACITY = 10
+    RATELIMIT_AUTH_REFILL_RATE = 10 / 60  # tokens por segundo
+    
+    # Proxies confiáveis na frente do app (X-Forwarded-For); 1 no Render
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    
     # Configurações de upload
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = 'uploads'
@@ -65,6 +117,8 @@ class TestingConfig(Config):
     
     # Usar banco de dados em memória para testes
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_BINDS = {}
+    SHARD_KEYS = []
     
     # Desabilitar CSRF para testes
     WTF_CSRF_ENABLED = False
@@ -96,6 +150,10 @@ class ProductionConfig(Config):
     # Configurações de cache para produção
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = os.environ.get('REDIS_URL')
+    
+    # Rate limiting e eventos compartilhados entre os workers do gunicorn
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'sqlite')
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'sqlite')
 
 
 class StagingConfig(Config):
@@ -0,0 +1,64 @@
+"""Link transactions and categories to financial goals
+
+Revision ID: 0001_goal_links
+Revises: 
+Create Date: 2026-10-19 12:00:00
+
+The app creates missing tables with db.create_all() on start, so this
+only adds the columns to tables created before goal links existed.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_goal_links'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # Batch mode rebuilds the table on SQLite, which cannot ALTER in a
+    # foreign key constraint.
+    if 'goal_id' not in _columns('transactions'):
+        with op.batch_alter_table('transactions') as batch_op:
+            batch_op.add_column(sa.Column('goal_id', sa.Integer()))
+            batch_op.create_foreign_key(
+                'fk_transactions_goal_id', 'financial_goals', ['goal_id'], ['id']
+            )
+    
+    goal_columns = _columns('financial_goals')
+    if 'category_id' not in goal_columns:
+        with op.batch_alter_table('financial_goals') as batch_op:
+            batch_op.add_column(sa.Column('category_id', sa.Integer()))
+            batch_op.create_foreign_key(
+                'fk_financial_goals_category_id', 'categories', ['category_id'], ['id']
+            )
+    if 'progress' not in goal_columns:
+        op.add_column('financial_goals', sa.Column('progress', sa.Numeric(5, 2), server_default='0'))
+    if 'initial_amount' not in goal_columns:
+        op.add_column('financial_goals', sa.Column('initial_amount', sa.Numeric(10, 2), server_default='0'))
+        # Until now clients maintained current_amount by hand, so it becomes
+        # the starting amount that linked transactions are added to.
+        op.execute(
+            "UPDATE financial_goals SET "
+            "initial_amount = COALESCE(current_amount, 0), "
+            "progress = CASE "
+            "WHEN target_amount <= 0 THEN 0 "
+            "WHEN COALESCE(current_amount, 0) >= target_amount THEN 100 "
+            "ELSE COALESCE(current_amount, 0) * 100 / target_amount END"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('financial_goals') as batch_op:
+        batch_op.drop_column('initial_amount')
+        batch_op.drop_column('progress')
+        batch_op.drop_column('category_id')
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_column('goal_id')
@@ -0,0 +1,42 @@
+"""Rebuild revoked_tokens with AUTOINCREMENT ids
+
+Revision ID: 0002_revoked_tokens_autoincrement
+Revises: 0001_goal_links
+Create Date: 2026-10-19 12:10:00
+
+Workers pick up revocations by id, so an id freed by 'flask tokens prune'
+must not be reused. Only SQLite tables created before the model asked
+for AUTOINCREMENT are rebuilt.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_revoked_tokens_autoincrement'
+down_revision = '0001_goal_links'
+branch_labels = None
+depends_on = None
+
+
+def _needs_autoincrement(table):
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return False
+    sql = bind.execute(
+        sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': table}
+    ).scalar()
+    return sql is not None and 'AUTOINCREMENT' not in sql.upper()
+
+
+def upgrade():
+    if _needs_autoincrement('revoked_tokens'):
+        with op.batch_alter_table(
+            'revoked_tokens', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            pass
+
+
+def downgrade():
+    pass
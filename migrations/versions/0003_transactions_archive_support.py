@@ -0,0 +1,65 @@
+"""Prepare transactions for archiving
+
+Revision ID: 0003_transactions_archive_support
+Revises: 0002_revoked_tokens_autoincrement
+Create Date: 2026-10-19 12:20:00
+
+Archived rows keep their transaction id, so the hot table must never
+reuse an id: older SQLite tables are rebuilt with AUTOINCREMENT and the
+sequence is moved past every archived id. Also adds the (user_id, date)
+index the date-range reads rely on.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_transactions_archive_support'
+down_revision = '0002_revoked_tokens_autoincrement'
+branch_labels = None
+depends_on = None
+
+
+def _needs_autoincrement(bind, table):
+    if bind.dialect.name != 'sqlite':
+        return False
+    sql = bind.execute(
+        sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': table}
+    ).scalar()
+    return sql is not None and 'AUTOINCREMENT' not in sql.upper()
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    
+    if _needs_autoincrement(bind, 'transactions'):
+        with op.batch_alter_table(
+            'transactions', recreate='always', table_kwargs={'sqlite_autoincrement': True}
+        ) as batch_op:
+            pass
+        
+        if inspector.has_table('transactions_archive'):
+            max_archived = bind.execute(sa.text('SELECT MAX(id) FROM transactions_archive')).scalar()
+            seq = bind.execute(
+                sa.text("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'")
+            ).scalar()
+            if max_archived is not None and seq is None:
+                op.execute(
+                    sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('transactions', :seq)")
+                    .bindparams(seq=max_archived)
+                )
+            elif max_archived is not None and seq < max_archived:
+                op.execute(
+                    sa.text("UPDATE sqlite_sequence SET seq = :seq WHERE name = 'transactions'")
+                    .bindparams(seq=max_archived)
+                )
+    
+    indexes = {index['name'] for index in sa.inspect(bind).get_indexes('transactions')}
+    if 'ix_transactions_user_date' not in indexes:
+        op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'date'])
+
+
+def downgrade():
+    op.drop_index('ix_transactions_user_date', table_name='transactions')
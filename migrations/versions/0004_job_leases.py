@@ -0,0 +1,32 @@
+"""Add a renewable lease to background jobs
+
+Revision ID: 0004_job_leases
+Revises: 0003_transactions_archive_support
+Create Date: 2026-10-19 12:30:00
+
+Workers extend lease_expires_at while a job runs; only jobs whose lease
+has lapsed are requeued. Running jobs from before this revision have no
+lease and fall back to started_at.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_job_leases'
+down_revision = '0003_transactions_archive_support'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('jobs'):
+        return
+    if 'lease_expires_at' not in {column['name'] for column in inspector.get_columns('jobs')}:
+        op.add_column('jobs', sa.Column('lease_expires_at', sa.DateTime()))
+
+
+def downgrade():
+    with op.batch_alter_table('jobs') as batch_op:
+        batch_op.drop_column('lease_expires_at')
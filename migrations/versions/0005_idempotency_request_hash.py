@@ -0,0 +1,31 @@
+"""Store a hash of the request with each Idempotency-Key
+
+Revision ID: 0005_idempotency_request_hash
+Revises: 0004_job_leases
+Create Date: 2026-10-19 12:40:00
+
+A reused key is rejected when the request body differs from the first
+one. Keys stored before this revision have no hash and are not checked.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_idempotency_request_hash'
+down_revision = '0004_job_leases'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('idempotency_keys'):
+        return
+    if 'request_hash' not in {column['name'] for column in inspector.get_columns('idempotency_keys')}:
+        op.add_column('idempotency_keys', sa.Column('request_hash', sa.String(64)))
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_keys') as batch_op:
+        batch_op.drop_column('request_hash')
@@ -0,0 +1,32 @@
+"""Add global id sequences for sharded tables
+
+Revision ID: 0006_id_sequences
+Revises: 0005_idempotency_request_hash
+Create Date: 2026-10-19 12:50:00
+
+With sharding on, rows of sharded tables take their ids from these
+sequences in the main database, so ids stay unique and stable when a
+user moves between shards. The app seeds them on start.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_id_sequences'
+down_revision = '0005_idempotency_request_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('id_sequences'):
+        op.create_table(
+            'id_sequences',
+            sa.Column('name', sa.String(100), primary_key=True),
+            sa.Column('last_id', sa.Integer(), nullable=False)
+        )
+
+
+def downgrade():
+    op.drop_table('id_sequences')